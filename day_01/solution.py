@@ -1,9 +1,21 @@
+import os
+from collections.abc import Iterable
+from multiprocessing import Pool
+
+import numpy as np
+
+
 def read_lines(path: str) -> list[str]:
     with open(path, 'r', encoding='utf-8') as f:
         data = f.readlines()
     return [l.strip('\n') for l in data]
 
 
+def read_bytes(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
 def __digits_to_number(digits: list[int | str]) -> int:
     return int(str(digits[0]) + str(digits[-1]))
 
@@ -20,6 +32,32 @@ def find_digits(data: list[str]) -> list[list[int]]:
     return [__find_digits_in_line(line) for line in data]
 
 
+def calibration_sum_vectorized(buffer: bytes) -> int:
+    """Sum calibration values for part 1 using only array operations on the raw bytes.
+
+    >>> calibration_sum_vectorized(b'1abc2\\npqr3stu8vwx\\na1b2c3d4e5f\\ntreb7uchet\\n')
+    142
+    >>> calibration_sum_vectorized(b'\\nabc\\n12')
+    12
+    """
+    data = np.frombuffer(buffer, dtype=np.uint8)
+
+    digit_indices = np.flatnonzero((data >= ord('0')) & (data <= ord('9')))
+    if not digit_indices.size:
+        return 0
+    # Line number of each digit = number of newlines before it
+    newline_indices = np.flatnonzero(data == ord('\n'))
+    digit_lines = np.searchsorted(newline_indices, digit_indices)
+
+    # Digits are ordered by position, so line changes mark the first and the last digit of each line
+    line_change = digit_lines[1:] != digit_lines[:-1]
+    is_first = np.concatenate(([True], line_change))
+    is_last = np.concatenate((line_change, [True]))
+
+    digit_values = data[digit_indices].astype(np.int64) - ord('0')
+    return int(digit_values[is_first].sum() * 10 + digit_values[is_last].sum())
+
+
 _words = ['zero', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine']
 
 
@@ -46,17 +84,159 @@ def find_digits_and_digit_words(data: list[str]) -> list[list[int]]:
     return [__find_digits_and_digit_words_in_line(line) for line in data]
 
 
+def build_automaton(words: list[str] | None = None) -> tuple[list[dict[str, int]], list[int | None]]:
+    """Build Aho-Corasick automaton (with all transitions resolved) for the digit words.
+
+    Returns transitions for every state and the digit recognized in every state (None if no word ends there).
+    Characters which do not occur in any of the words are not stored - they always lead back to the root.
+
+    >>> transitions, outputs = build_automaton(['one', 'two'])
+    >>> state = 0
+    >>> for c in 'twone':
+    ...     state = transitions[state].get(c, 0)
+    ...     print(c, outputs[state])
+    t None
+    w None
+    o 1
+    n None
+    e 0
+    """
+    words = words or _words
+    alphabet = sorted(set(''.join(words)))
+
+    # Trie
+    children = [{}]
+    outputs = [None]
+    for value, word in enumerate(words):
+        state = 0
+        for c in word:
+            if c not in children[state]:
+                children[state][c] = len(children)
+                children.append({})
+                outputs.append(None)
+            state = children[state][c]
+        outputs[state] = value
+
+    # Breadth first over the trie - fail state of every node is resolved before its children
+    transitions = [{} for _ in children]
+    fail = [0] * len(children)
+    queue = [0]
+    for state in queue:
+        for c in alphabet:
+            child = children[state].get(c)
+            if child is None:
+                transitions[state][c] = transitions[fail[state]][c] if state else 0
+                continue
+            transitions[state][c] = child
+            fail[child] = transitions[fail[state]][c] if state else 0
+            if outputs[child] is None:
+                outputs[child] = outputs[fail[child]]
+            queue.append(child)
+
+    # Drop transitions back to the root, missing keys mean the same
+    transitions = [{c: s for c, s in t.items() if s} for t in transitions]
+    return transitions, outputs
+
+
+_automaton = build_automaton()
+
+
+def scan_line(line: str) -> tuple[int | None, int | None, int | None, int | None]:
+    """Find first and last digit as well as first and last digit or digit word in a single pass over the line.
+
+    >>> scan_line('two1nine')
+    (1, 1, 2, 9)
+    >>> scan_line('eightwothree')
+    (None, None, 8, 3)
+    >>> scan_line('7pqrstsixteen')
+    (7, 7, 7, 6)
+    """
+    transitions, outputs = _automaton
+
+    first_digit = last_digit = first_any = last_any = None
+    state = 0
+    for c in line:
+        if c.isdigit():
+            value = int(c)
+            if first_digit is None:
+                first_digit = value
+            last_digit = value
+            state = 0
+        else:
+            state = transitions[state].get(c, 0)
+            value = outputs[state]
+            if value is None:
+                continue
+
+        if first_any is None:
+            first_any = value
+        last_any = value
+
+    return first_digit, last_digit, first_any, last_any
+
+
+def calibration_sums(data: Iterable[str]) -> tuple[int, int]:
+    """Sum calibration values for both parts at once. Lines without any digit add 0 to the sum.
+
+    >>> calibration_sums(['1abc2', 'two1nine', 'xtwone3four'])
+    (56, 65)
+    """
+    part_1 = 0
+    part_2 = 0
+    for line in data:
+        first_digit, last_digit, first_any, last_any = scan_line(line)
+        if first_digit is not None:
+            part_1 += first_digit * 10 + last_digit
+        if first_any is not None:
+            part_2 += first_any * 10 + last_any
+    return part_1, part_2
+
+
+def chunk_offsets(path: str, chunk_size: int = 64 * 1024 * 1024) -> Iterable[tuple[int, int]]:
+    """Split the file into (start, end) byte ranges of roughly chunk_size bytes, each ending on a newline."""
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        start = 0
+        while start < file_size:
+            f.seek(min(start + chunk_size, file_size))
+            # Move the end of the chunk to the end of the current line
+            f.readline()
+            end = f.tell()
+            yield start, end
+            start = end
+
+
+def _chunk_calibration_sums(chunk: tuple[str, int, int]) -> tuple[int, int]:
+    path, start, end = chunk
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return calibration_sums(data.decode('utf-8').split('\n'))
+
+
+def calibration_sums_parallel(path: str, chunk_size: int = 64 * 1024 * 1024,
+                              processes: int | None = None) -> tuple[int, int]:
+    """Sum calibration values for both parts, reading the file in chunks processed in a pool of processes.
+
+    Only one chunk per worker is held in memory at a time.
+    """
+    chunks = ((path, start, end) for start, end in chunk_offsets(path, chunk_size))
+
+    part_1 = 0
+    part_2 = 0
+    with Pool(processes) as pool:
+        for chunk_part_1, chunk_part_2 in pool.imap_unordered(_chunk_calibration_sums, chunks):
+            part_1 += chunk_part_1
+            part_2 += chunk_part_2
+    return part_1, part_2
+
+
 if __name__ == "__main__":
     path = 'input.txt'
 
     data = read_lines(path)
 
-    # part 1
-    data_digits = find_digits(data)
-    calibration_numbers = digits_to_numbers(data_digits)
-    print(sum(calibration_numbers))
-
-    # part 2
-    data_digits = find_digits_and_digit_words(data)
-    calibration_numbers = digits_to_numbers(data_digits)
-    print(sum(calibration_numbers))
+    # part 1 and part 2 in one pass
+    part_1, part_2 = calibration_sums(data)
+    print(part_1)
+    print(part_2)
@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+import bisect
+from collections.abc import Iterable
 from dataclasses import dataclass
+from functools import cached_property
 from typing import Self
 
+import numpy as np
+
 
 def read_data(path: str) -> list[str]:
     with open(path, 'r', encoding='utf-8') as f:
@@ -68,18 +73,140 @@ class Game:
         return CubesSet(red, green, blue)
 
 
+@dataclass
+class Games:
+    """All games stored column-wise - rounds of game i are at indices round_offsets[i]:round_offsets[i + 1]."""
+    ids: np.ndarray
+    round_offsets: np.ndarray
+    red: np.ndarray
+    green: np.ndarray
+    blue: np.ndarray
+
+    @classmethod
+    def from_game_strs(cls, games: Iterable[str]) -> Self:
+        ids = []
+        round_offsets = [0]
+        colors = {'red': [], 'green': [], 'blue': []}
+
+        for game in games:
+            game_str, rounds_str = game.split(':')
+            ids.append(int(game_str.split()[1]))
+
+            for round_str in rounds_str.split(';'):
+                round_ = dict.fromkeys(colors, 0)
+                for cube_str in round_str.split(','):
+                    cnt, color = cube_str.split()
+                    round_[color] = int(cnt)
+                for color, cnt in round_.items():
+                    colors[color].append(cnt)
+
+            round_offsets.append(len(colors['red']))
+
+        return cls(np.array(ids, dtype=np.int32), np.array(round_offsets, dtype=np.int64),
+                   *(np.array(colors[color], dtype=np.int32) for color in ('red', 'green', 'blue')))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def find_minimum_sets(self) -> np.ndarray:
+        """Minimum set of every game as (games, 3) array with red, green and blue columns.
+
+        >>> Games.from_game_strs(['Game 1: 3 blue, 4 red; 1 red, 2 green, 6 blue; 2 green']).find_minimum_sets()
+        array([[4, 2, 6]], dtype=int32)
+        """
+        rounds = np.stack((self.red, self.green, self.blue), axis=1)
+        return np.maximum.reduceat(rounds, self.round_offsets[:-1], axis=0)
+
+    def is_possible(self, cubes: CubesSet) -> np.ndarray:
+        return np.all(self.find_minimum_sets() <= (cubes.red, cubes.green, cubes.blue), axis=1)
+
+    def powers(self) -> np.ndarray:
+        return np.prod(self.find_minimum_sets(), axis=1, dtype=np.int64)
+
+    @cached_property
+    def _sweep_index(self) -> tuple[list[tuple[int, int, int, int]], list[int], list[list[int]]]:
+        """Static part of the offline sweep over red values.
+
+        Returns games as (red, green index, blue, id) sorted by red, distinct green values and, for every node of
+        the Fenwick tree over green indices, sorted blue values of games which are added to that node.
+        """
+        minimum_sets = self.find_minimum_sets().tolist()
+
+        greens = sorted(set(green for _, green, _ in minimum_sets))
+        green_indices = {green: index for index, green in enumerate(greens, 1)}
+
+        games = sorted((red, green_indices[green], blue, int(id_))
+                       for (red, green, blue), id_ in zip(minimum_sets, self.ids))
+
+        node_blues = [set() for _ in range(len(greens) + 1)]
+        for _, node, blue, _ in games:
+            while node <= len(greens):
+                node_blues[node].add(blue)
+                node += node & -node
+
+        return games, greens, [sorted(blues) for blues in node_blues]
+
+    def possible_ids_sums(self, bags: Iterable[CubesSet] | np.ndarray) -> np.ndarray:
+        """Sum of ids of possible games for every bag (CubesSets or (bags, 3) array with red, green and blue columns).
+
+        Bags are processed in order of red - games which fit by red are added to a 2-D Fenwick tree over (green, blue),
+        which answers how many of them fit by green and blue. Memory is O(games * log(games)).
+
+        >>> games = Games.from_game_strs(['Game 1: 3 blue, 4 red', 'Game 2: 1 blue, 2 green', 'Game 3: 5 red'])
+        >>> games.possible_ids_sums([CubesSet(12, 13, 14), CubesSet(4, 0, 3), CubesSet(0, 1, 1)])
+        array([6, 1, 0])
+        """
+        if not isinstance(bags, np.ndarray):
+            bags = [(bag.red, bag.green, bag.blue) for bag in bags]
+        bags = np.asarray(bags, dtype=np.int64).reshape(-1, 3).tolist()
+
+        games, greens, node_blues = self._sweep_index
+        # Inner Fenwick trees (1-based) over blue values of every node
+        trees = [[0] * (len(blues) + 1) for blues in node_blues]
+
+        sums = np.zeros(len(bags), dtype=np.int64)
+        game_index = 0
+        for bag_index in sorted(range(len(bags)), key=lambda index: bags[index][0]):
+            red, green, blue = bags[bag_index]
+
+            # Add games which fit by red
+            while game_index < len(games) and games[game_index][0] <= red:
+                _, node, game_blue, id_ = games[game_index]
+                while node < len(trees):
+                    tree = trees[node]
+                    position = bisect.bisect_left(node_blues[node], game_blue) + 1
+                    while position < len(tree):
+                        tree[position] += id_
+                        position += position & -position
+                    node += node & -node
+                game_index += 1
+
+            # Sum ids of the added games which fit by green and blue
+            total = 0
+            node = bisect.bisect_right(greens, green)
+            while node > 0:
+                tree = trees[node]
+                position = bisect.bisect_right(node_blues[node], blue)
+                while position > 0:
+                    total += tree[position]
+                    position -= position & -position
+                node -= node & -node
+            sums[bag_index] = total
+
+        return sums
+
+
 if __name__ == '__main__':
     path = 'input.txt'
 
     games_raw = read_data(path)
 
-    games = [Game.from_game_str(game_str) for game_str in games_raw]
+    games = Games.from_game_strs(games_raw)
 
     # Part 1
     cubes_total = CubesSet(12, 13, 14)
 
-    possible_games = [game for game in games if game.is_possible(cubes_total)]
-    print(sum(game.id_ for game in possible_games))
+    print(games.ids[games.is_possible(cubes_total)].sum())
 
     # Part 2
-    print(sum(game.find_minimum_set().power for game in games))
+    print(games.powers().sum())
@@ -1,6 +1,11 @@
+import bisect
+import itertools
 from collections.abc import Iterable
+from multiprocessing import Pool
 from typing import NamedTuple, Self
 
+import numpy as np
+
 
 def read(path: str) -> list[str]:
     with open(path, 'r', encoding='utf-8') as f:
@@ -107,6 +112,123 @@ def find_part_numbers_sum(lines_iter: Iterable[str]) -> int:
     return total_sum
 
 
+def iter_bands(lines_iter: Iterable[str], band_size: int) -> Iterable[tuple[str | None, list[str], str | None]]:
+    """Split lines into bands, each with one line of context before and after (None at the edges of the schematic).
+
+    >>> list(iter_bands(['a', 'b', 'c', 'd', 'e'], 2))
+    [(None, ['a', 'b'], 'c'), ('b', ['c', 'd'], 'e'), ('d', ['e'], None)]
+    """
+    lines_iter = iter(lines_iter)
+    prev_line = None
+    band = list(itertools.islice(lines_iter, band_size))
+    while band:
+        next_band = list(itertools.islice(lines_iter, band_size))
+        next_line = next_band[0] if next_band else None
+        yield prev_line, band, next_line
+        prev_line = band[-1]
+        band = next_band
+
+
+def find_part_numbers_sum_in_band(band: tuple[str | None, list[str], str | None]) -> int:
+    """Sum part numbers from the band lines only - context lines are just scanned for symbols."""
+    prev_line, lines, next_line = band
+
+    scanned_lines = [scan_line(line) for line in lines]
+    symbol_indices = ([scan_line(prev_line)[1] if prev_line is not None else set()]
+                      + [line_symbol_indices for _, line_symbol_indices in scanned_lines]
+                      + [scan_line(next_line)[1] if next_line is not None else set()])
+
+    total_sum = 0
+    for index, (curr_line_numbers, curr_line_symbol_indices) in enumerate(scanned_lines):
+        total_sum += sum(find_part_numbers_in_line(symbol_indices[index],
+                                                   curr_line_symbol_indices, curr_line_numbers,
+                                                   symbol_indices[index + 2]))
+    return total_sum
+
+
+def find_part_numbers_sum_parallel(lines_iter: Iterable[str], band_size: int = 10000,
+                                   processes: int | None = None) -> int:
+    """Same result as find_part_numbers_sum, bands of rows are processed in a pool of processes.
+
+    Every row belongs to exactly one band, so numbers on band borders are counted only once.
+    """
+    with Pool(processes) as pool:
+        return sum(pool.imap_unordered(find_part_numbers_sum_in_band, iter_bands(lines_iter, band_size)))
+
+
+def find_char_indices(line: str, char: str = '*') -> list[int]:
+    """
+    >>> find_char_indices('617*...*..')
+    [3, 7]
+    """
+    indices = []
+    index = line.find(char)
+    while index != -1:
+        indices.append(index)
+        index = line.find(char, index + 1)
+    return indices
+
+
+def find_adjacent_numbers(numbers: list[tuple[tuple[int], int]], index: int) -> list[int]:
+    """Find numbers (as returned by scan_line) adjacent to the index in the line above, below or the same line.
+
+    >>> find_adjacent_numbers(scan_line('467..114..')[0], 3)
+    [467]
+    >>> find_adjacent_numbers(scan_line('..35..633.')[0], 4)
+    [35]
+    >>> find_adjacent_numbers(scan_line('.1.2.3.4..')[0], 4)
+    [2, 3]
+    """
+    # Numbers are sorted and do not overlap, so only the last 3 numbers starting before index + 1 can be adjacent
+    end = bisect.bisect_right(numbers, index + 1, key=lambda number: number[0][0])
+    return [number for number_indices, number in numbers[max(end - 3, 0):end] if number_indices[-1] >= index - 1]
+
+
+def find_gear_ratios_in_line(prev_line_numbers: list[tuple[tuple[int], int]],
+                             curr_line_numbers: list[tuple[tuple[int], int]], curr_line_gear_indices: list[int],
+                             next_line_numbers: list[tuple[tuple[int], int]]) -> list[int]:
+    found_gear_ratios = []
+    for gear_index in curr_line_gear_indices:
+        adjacent_numbers = (find_adjacent_numbers(prev_line_numbers, gear_index)
+                            + find_adjacent_numbers(curr_line_numbers, gear_index)
+                            + find_adjacent_numbers(next_line_numbers, gear_index))
+        if len(adjacent_numbers) >= 2:
+            found_gear_ratios.append(adjacent_numbers[0] * adjacent_numbers[1])
+    return found_gear_ratios
+
+
+def find_part_numbers_and_gear_ratios_sums(lines_iter: Iterable[str]) -> tuple[int, int]:
+    """Find sums for both parts iterating over every row only once (keeping only three rows in memory).
+
+    >>> find_part_numbers_and_gear_ratios_sums(['467..114..', '...*......', '..35..633.', '......#...', '617*......',
+    ...                                         '.....+.58.', '..592.....', '......755.', '...$.*....', '.664.598..'])
+    (4361, 467835)
+    """
+    # Every line is kept as (numbers, symbol indices, gear indices), empty lines surround the schematic
+    empty_line = ([], set(), [])
+    prev_line = empty_line
+    curr_line = None
+
+    part_numbers_sum = 0
+    gear_ratios_sum = 0
+    for line in lines_iter:
+        next_line = (*scan_line(line), find_char_indices(line))
+
+        if curr_line is not None:
+            part_numbers_sum += sum(find_part_numbers_in_line(prev_line[1], curr_line[1], curr_line[0], next_line[1]))
+            gear_ratios_sum += sum(find_gear_ratios_in_line(prev_line[0], curr_line[0], curr_line[2], next_line[0]))
+            prev_line = curr_line
+
+        curr_line = next_line
+
+    # Run for the last line
+    if curr_line is not None:
+        part_numbers_sum += sum(find_part_numbers_in_line(prev_line[1], curr_line[1], curr_line[0], empty_line[1]))
+        gear_ratios_sum += sum(find_gear_ratios_in_line(prev_line[0], curr_line[0], curr_line[2], empty_line[0]))
+
+    return part_numbers_sum, gear_ratios_sum
+
+
 # Ok, first part was overcomplicated (additional challenge was to iterate over every row only once),
 # so now let's do it the easy way
 
@@ -189,29 +311,120 @@ def find_numbers(data: list[str]) -> list[NumberPosition]:
     return positions
 
 
+def index_numbers(numbers: list[NumberPosition]) -> dict[Position, int]:
+    """Map every position occupied by a digit to the index of its number (as returned by find_numbers).
+
+    >>> index_numbers(find_numbers(['467..', '...35']))
+    {Position(x=0, y=0): 0, Position(x=0, y=1): 0, Position(x=0, y=2): 0, Position(x=1, y=3): 1, Position(x=1, y=4): 1}
+    """
+    return {position: number_id for number_id, number in enumerate(numbers) for position in number.positions}
+
+
+_neighbour_offsets = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+
+
 def find_gear_ratios_sum(data: list[str]) -> int:
+    """
+    >>> find_gear_ratios_sum(['467..114..', '...*......', '..35..633.', '......#...', '617*......', '.....+.58.',
+    ...                       '..592.....', '......755.', '...$.*....', '.664.598..'])
+    467835
+    """
     numbers = find_numbers(data)
+    numbers_index = index_numbers(numbers)
 
     gear_rations_sum = 0
     for symbol_position in symbol_positions_iter(data):
-        found_adjacent_numbers = []
-        for number in numbers:
-            if is_adjacent(number, symbol_position):
-                found_adjacent_numbers.append(number)
-
-                if len(found_adjacent_numbers) == 2:
-                    gear_rations_sum += found_adjacent_numbers[0].value * found_adjacent_numbers[1].value
-                    break
+        # The same number can occupy several neighbouring positions
+        adjacent_number_ids = {numbers_index.get(Position(symbol_position.x + dx, symbol_position.y + dy))
+                               for dx, dy in _neighbour_offsets}
+        adjacent_number_ids.discard(None)
+
+        if len(adjacent_number_ids) >= 2:
+            first, second = sorted(adjacent_number_ids)[:2]
+            gear_rations_sum += numbers[first].value * numbers[second].value
     return gear_rations_sum
 
 
+# Vectorized version - whole schematic as 2-D array of bytes
+
+def to_array(data: list[str]) -> np.ndarray:
+    """Schematic as 2-D uint8 array. Every row keeps its trailing newline, so digit runs never cross rows.
+
+    >>> to_array(['4.', '*1'])
+    array([[52, 46, 10],
+           [42, 49, 10]], dtype=uint8)
+    """
+    return np.frombuffer(('\n'.join(data) + '\n').encode('ascii'), dtype=np.uint8).reshape(len(data), -1)
+
+
+def read_array(path: str) -> np.ndarray:
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.endswith(b'\n'):
+        data += b'\n'
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, data.index(b'\n') + 1)
+
+
+# Sums which may reach this limit are computed with Python ints
+_INT64_SAFE_LIMIT = 2.0 ** 62
+
+
+def find_part_numbers_sum_vectorized(schematic: np.ndarray) -> int:
+    """Same result as find_part_numbers_sum (a number is counted once for every row in which it has an adjacent symbol).
+
+    >>> find_part_numbers_sum_vectorized(to_array(['467..114..', '...*......', '..35..633.', '......#...',
+    ...                                             '617*......', '.....+.58.', '..592.....', '......755.',
+    ...                                             '...$.*....', '.664.598..']))
+    4361
+    >>> find_part_numbers_sum_vectorized(to_array(['1234567890123456789012*']))
+    1234567890123456789012
+    >>> find_part_numbers_sum_vectorized(to_array(['......114\\r', '.........\\r']))
+    0
+    """
+    is_digit = (schematic >= ord('0')) & (schematic <= ord('9'))
+    # Line endings (also CRLF ones) are not symbols
+    is_symbol = ~is_digit & (schematic != ord('.')) & (schematic != ord('\n')) & (schematic != ord('\r'))
+
+    # Dilate symbols horizontally - shifting rows of the result gives 3x3 neighbourhood split by row
+    padded = np.pad(is_symbol, 1)
+    near_symbol = padded[:, :-2] | padded[:, 1:-1] | padded[:, 2:]
+    near_symbol_rows = (near_symbol[:-2], near_symbol[1:-1], near_symbol[2:])
+
+    # Label contiguous runs of digits
+    digits = is_digit.ravel()
+    digit_positions = np.flatnonzero(digits)
+    if not digit_positions.size:
+        return 0
+    run_starts = np.flatnonzero(np.diff(digit_positions, prepend=-2) != 1)
+    run_ends = np.append(run_starts[1:], digit_positions.size) - 1
+    run_ids = np.repeat(np.arange(run_starts.size), np.diff(np.append(run_starts, digit_positions.size)))
+
+    adjacent_rows_cnt = sum(np.logical_or.reduceat(near.ravel()[digit_positions], run_starts).astype(np.int64)
+                            for near in near_symbol_rows)
+
+    # Upper bound of the result - every number is lower than 10 ** its length and counted at most 3 times
+    run_lengths = run_ends - run_starts + 1
+    if (3 * np.power(10.0, run_lengths)).sum() >= _INT64_SAFE_LIMIT:
+        # Numbers or their sum would overflow int64 - use Python ints
+        schematic_bytes = schematic.tobytes()
+        values = np.array([int(schematic_bytes[start:end + 1]) for start, end
+                           in zip(digit_positions[run_starts].tolist(), digit_positions[run_ends].tolist())],
+                          dtype=object)
+        return int((values * adjacent_rows_cnt.astype(object)).sum())
+
+    # Value of every run - each digit multiplied by power of 10 according to its distance from the end of the run
+    powers = digit_positions[run_ends][run_ids] - digit_positions
+    digit_values = schematic.ravel()[digit_positions].astype(np.int64) - ord('0')
+    values = np.add.reduceat(digit_values * np.power(10, powers, dtype=np.int64), run_starts)
+
+    return int((values * adjacent_rows_cnt).sum())
+
+
 if __name__ == '__main__':
     path = 'input.txt'
 
-    # Part 1
+    # Part 1 and Part 2 in one pass
     gen = read_gen(path)
-    print(find_part_numbers_sum(gen))
-
-    # Part 2
-    data = read(path)
-    print(find_gear_ratios_sum(data))
+    part_numbers_sum, gear_ratios_sum = find_part_numbers_and_gear_ratios_sums(gen)
+    print(part_numbers_sum)
+    print(gear_ratios_sum)
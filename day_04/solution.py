@@ -1,7 +1,10 @@
-from collections.abc import Iterable
+from collections import deque
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass, field
 from typing import Self
 
+import numpy as np
+
 
 def read(path: str) -> list[str]:
     with open(path, 'r', encoding='utf-8') as f:
@@ -10,6 +13,12 @@ def read(path: str) -> list[str]:
     return data
 
 
+def read_gen(path: str) -> Iterable[str]:
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield line.strip('\n')
+
+
 def __to_set(numbers_str: str) -> set[int]:
     """
     >>> __to_set('1 2 3')
@@ -63,6 +72,107 @@ def total_value(data: Iterable[str]) -> int:
     return sum(Card.from_str(line).value for line in data)
 
 
+def __to_mask(numbers_str: str) -> int:
+    """
+    >>> bin(__to_mask(' 1 3  4'))
+    '0b11010'
+    """
+    mask = 0
+    for num in numbers_str.split():
+        mask |= 1 << int(num)
+    return mask
+
+
+def _parse_card_masks(line: str) -> tuple[int, int, int]:
+    card_info, numbers = line.split(':')
+
+    _, card_id = card_info.split()
+
+    winning_numbers, actual_numbers = numbers.split('|')
+
+    return int(card_id), __to_mask(winning_numbers), __to_mask(actual_numbers)
+
+
+@dataclass
+class BitCard:
+    """Card with numbers stored as bitmasks (bit n is set if number n is on the card)."""
+    id_: int
+    winning_mask: int
+    actual_mask: int
+
+    @classmethod
+    def from_str(cls, card_str: str) -> Self:
+        return cls(*_parse_card_masks(card_str))
+
+    @property
+    def value(self) -> int:
+        overlapping_cnt = self.matched_cnt
+
+        if overlapping_cnt == 0:
+            return 0
+
+        return 2 ** (overlapping_cnt - 1)
+
+    @property
+    def matched_cnt(self) -> int:
+        """
+        >>> BitCard.from_str('Card 1: 41 48 83 86 17 | 83 86  6 31 17  9 48 53').matched_cnt
+        4
+        """
+        return (self.winning_mask & self.actual_mask).bit_count()
+
+
+def _to_words(masks: list[int], words_cnt: int) -> np.ndarray:
+    """Split masks into (masks, words_cnt) array of 64 bit words.
+
+    >>> _to_words([1, 1 << 64 | 2], 2)
+    array([[1, 0],
+           [2, 1]], dtype=uint64)
+    """
+    masks = np.array(masks, dtype=object)
+    words = np.empty((len(masks), words_cnt), dtype=np.uint64)
+    for word in range(words_cnt):
+        words[:, word] = (masks >> (64 * word)) & 0xFFFF_FFFF_FFFF_FFFF
+    return words
+
+
+def matched_counts(cards: list[BitCard]) -> np.ndarray:
+    """Matched count of every card computed at once.
+
+    >>> matched_counts([BitCard.from_str('Card 1: 41 48 83 86 17 | 83 86  6 31 17  9 48 53'),
+    ...                 BitCard.from_str('Card 2: 1 2 3 | 3 4 5'), BitCard.from_str('Card 3: 130 | 7')])
+    array([4, 1, 0])
+    """
+    max_mask = max((card.winning_mask | card.actual_mask for card in cards), default=0)
+    words_cnt = max((max_mask.bit_length() + 63) // 64, 1)
+
+    winning = _to_words([card.winning_mask for card in cards], words_cnt)
+    actual = _to_words([card.actual_mask for card in cards], words_cnt)
+
+    return np.bitwise_count(winning & actual).sum(axis=1, dtype=np.int64)
+
+
+def total_value_batched(data: Iterable[str]) -> int:
+    """
+    >>> total_value_batched(['Card 1: 1 2 3 | 2 3 4', 'Card 2: 5 | 6'])
+    2
+    >>> numbers = ' '.join(str(n) for n in range(63))
+    >>> total_value_batched([f'Card 1: {numbers} | {numbers}'])
+    4611686018427387904
+    >>> numbers = ' '.join(str(n) for n in range(100))
+    >>> total_value_batched([f'Card 1: {numbers} | {numbers}', f'Card 2: {numbers} | 1'])
+    633825300114114700748351602689
+    """
+    counts = matched_counts([BitCard.from_str(line) for line in data])
+
+    # Shifted values (or their sum) would overflow int64 - use Python ints
+    if counts.size and len(counts) << int(counts.max()) >= 2 ** 63:
+        return sum(1 << (count - 1) for count in counts.tolist() if count)
+
+    # 2 ** (count - 1), 0 for cards without matches
+    return int((np.left_shift(1, counts) >> 1).sum())
+
+
 # Part 2
 
 @dataclass
@@ -93,19 +203,46 @@ class PileOfCards:
         return str_
 
 
+def process_stream(lines: Iterable[str]) -> Iterator[int]:
+    """Yield the total number of cards in the pile after each processed card.
+
+    Won copies are kept as a difference array in a ring buffer - only as long as the largest matched count.
+
+    >>> list(process_stream(['Card 1: 41 48 83 86 17 | 83 86  6 31 17  9 48 53',
+    ...                      'Card 2: 13 32 20 16 61 | 61 30 68 82 17 32 24 19',
+    ...                      'Card 3:  1 21 53 59 44 | 69 82 63 72 16 21 14  1',
+    ...                      'Card 4: 41 92 73 84 69 | 59 84 76 51 58  5 54 83',
+    ...                      'Card 5: 87 83 26 28 32 | 88 30 70 12 93 22 82 36',
+    ...                      'Card 6: 31 18 13 56 72 | 74 77 10 23 35 67 36 11']))
+    [1, 3, 7, 15, 29, 30]
+    """
+    # copies_diffs[0] is the change of won copies at the next card
+    copies_diffs = deque()
+    won_copies = 0
+    total = 0
+    for line in lines:
+        if copies_diffs:
+            won_copies += copies_diffs.popleft()
+        card_copies = 1 + won_copies
+        total += card_copies
+        yield total
+
+        copies_won = BitCard.from_str(line).matched_cnt
+        if copies_won:
+            copies_diffs.extend([0] * (copies_won + 1 - len(copies_diffs)))
+            copies_diffs[0] += card_copies
+            copies_diffs[copies_won] -= card_copies
+
+
 if __name__ == '__main__':
     path = 'input.txt'
 
-    # change to generator
-    data = read(path)
-
     # Part 1
-    print(total_value(data))
+    print(total_value(read_gen(path)))
 
     # Part 2
-    cards = [Card.from_str(line) for line in data]
-    pile_of_cards = PileOfCards(cards)
-
-    pile_of_cards.process()
+    pile_size = 0
+    for pile_size in process_stream(read_gen(path)):
+        pass
 
-    print(len(pile_of_cards))
+    print(pile_size)
@@ -1,8 +1,15 @@
+import bisect
 import copy
+import functools
+import itertools
+from collections import deque
+from collections.abc import Iterable
 from dataclasses import dataclass
 from functools import cached_property
 from typing import Self
 
+import numpy as np
+
 
 def read(path: str) -> list[str]:
     with open(path, 'r', encoding='utf-8') as f:
@@ -14,6 +21,187 @@ def extract_seed_numbers(line: str) -> list[int]:
     return [int(num) for num in line.split(':')[1].strip().split()]
 
 
+@dataclass(frozen=True)
+class PiecewiseLinear:
+    """Function key -> key + offsets[bisect_right(starts, key)].
+
+    offsets[0] is used for keys lower than starts[0], offsets[i] for keys from starts[i - 1] to starts[i] - 1.
+
+    >>> f = PiecewiseLinear([10, 20], [0, 5, 0])
+    >>> [f[9], f[10], f[19], f[20]]
+    [9, 15, 24, 20]
+    """
+    starts: list[int]
+    offsets: list[int]
+
+    def __getitem__(self, key: int) -> int:
+        return key + self.offsets[bisect.bisect_right(self.starts, key)]
+
+    def map_array(self, keys: np.ndarray) -> np.ndarray:
+        """
+        >>> PiecewiseLinear([10, 20], [0, 5, 0]).map_array(np.array([9, 10, 19, 20]))
+        array([ 9, 15, 24, 20])
+        """
+        offsets = np.array(self.offsets, dtype=np.int64)
+        return keys + offsets[np.searchsorted(np.array(self.starts, dtype=np.int64), keys, side='right')]
+
+    def map_ranges(self, ranges: list[list[int, int]]) -> list[list[int, int]]:
+        """Map ranges (with inclusive ends), result is sorted and merged.
+
+        >>> PiecewiseLinear([10, 20], [0, 5, 0]).map_ranges([[5, 12], [18, 22]])
+        [[5, 9], [15, 17], [20, 24]]
+        """
+        mapped = []
+        for start, end in ranges:
+            index = bisect.bisect_right(self.starts, start)
+            # Split the range on every breakpoint inside it
+            while index < len(self.starts) and self.starts[index] <= end:
+                mapped.append([start + self.offsets[index], self.starts[index] - 1 + self.offsets[index]])
+                start = self.starts[index]
+                index += 1
+            mapped.append([start + self.offsets[index], end + self.offsets[index]])
+
+        return merge_ranges(sorted(mapped, key=lambda x: x[0]))
+
+    def then(self, other: Self) -> Self:
+        """Composition - key is mapped with self and then with other.
+
+        >>> f = PiecewiseLinear([10, 20], [0, 5, 0]).then(PiecewiseLinear([17], [0, 100]))
+        >>> f
+        PiecewiseLinear(starts=[10, 12, 20], offsets=[0, 5, 105, 100])
+        >>> [f[9], f[11], f[12], f[19], f[20]]
+        [9, 16, 117, 124, 120]
+        """
+        starts = []
+        offsets = []
+        for index, offset in enumerate(self.offsets):
+            start = self.starts[index - 1] if index > 0 else None
+            end = self.starts[index] if index < len(self.starts) else None
+
+            # Segment of other which contains mapped start of this segment
+            other_index = bisect.bisect_right(other.starts, start + offset) if start is not None else 0
+            if start is not None:
+                starts.append(start)
+            offsets.append(offset + other.offsets[other_index])
+
+            # Further segments of other overlapping with mapped segment
+            while other_index < len(other.starts) and (end is None or other.starts[other_index] < end + offset):
+                starts.append(other.starts[other_index] - offset)
+                other_index += 1
+                offsets.append(offset + other.offsets[other_index])
+
+        return type(self).simplified(starts, offsets)
+
+    @cached_property
+    def inverse(self) -> 'InversePiecewiseLinear':
+        """
+        >>> PiecewiseLinear([10, 20], [0, 5, 0]).inverse
+        InversePiecewiseLinear(starts=[10, 15, 20, 25], offsets=[[0], [], [0, 5], [5], [0]])
+        """
+        # Offsets of segments whose image covers the beginning of the key space
+        active = {self.offsets[0]}
+        # Changes of the covering segments at the starts and ends of segment images
+        events = []
+        for index, offset in enumerate(self.offsets):
+            if index > 0:
+                events.append((self.starts[index - 1] + offset, offset, True))
+            if index < len(self.starts):
+                events.append((self.starts[index] + offset, offset, False))
+        events.sort()
+
+        starts = []
+        offsets = [sorted(active)]
+        for start, start_events in itertools.groupby(events, key=lambda event: event[0]):
+            for _, offset, is_segment_start in start_events:
+                if is_segment_start:
+                    active.add(offset)
+                else:
+                    active.discard(offset)
+            starts.append(start)
+            offsets.append(sorted(active))
+
+        return InversePiecewiseLinear(starts, offsets)
+
+    @classmethod
+    def simplified(cls, starts: list[int], offsets: list[int]) -> Self:
+        """Create function without redundant breakpoints (between segments with the same offset).
+
+        >>> PiecewiseLinear.simplified([10, 20, 30], [0, 5, 5, 0])
+        PiecewiseLinear(starts=[10, 30], offsets=[0, 5, 0])
+        """
+        simplified_starts = []
+        simplified_offsets = [offsets[0]]
+        for start, offset in zip(starts, offsets[1:]):
+            if offset != simplified_offsets[-1]:
+                simplified_starts.append(start)
+                simplified_offsets.append(offset)
+        return cls(simplified_starts, simplified_offsets)
+
+
+@dataclass(frozen=True)
+class InversePiecewiseLinear:
+    """Inverse of PiecewiseLinear - every mapped value can come from any number of keys.
+
+    Mapped values are split into intervals in the same way as in PiecewiseLinear. Value v from the i-th interval
+    is the image of keys v - offset for every offset in offsets[i].
+    """
+    starts: list[int]
+    offsets: list[list[int]]
+
+    def _intervals(self, start: int, end: int) -> Iterable[tuple[int, int, list[int]]]:
+        """Intervals overlapping with [start, end] (clipped to it) with their offsets"""
+        index = bisect.bisect_right(self.starts, start)
+        while index < len(self.starts) and self.starts[index] <= end:
+            yield start, self.starts[index] - 1, self.offsets[index]
+            start = self.starts[index]
+            index += 1
+        yield start, end, self.offsets[index]
+
+    def map_ranges(self, ranges: list[list[int, int]]) -> list[list[int, int]]:
+        """Find all keys mapped into the ranges (with inclusive ends), result is sorted and merged.
+
+        >>> PiecewiseLinear([10, 20], [0, 5, 0]).inverse.map_ranges([[14, 21]])
+        [[10, 16], [20, 21]]
+        """
+        keys_ranges = []
+        for start, end in ranges:
+            for interval_start, interval_end, offsets in self._intervals(start, end):
+                keys_ranges.extend([interval_start - offset, interval_end - offset] for offset in offsets)
+
+        return merge_ranges(sorted(keys_ranges, key=lambda x: x[0]))
+
+    def lowest_reachable(self, ranges: list[list[int, int]]) -> int | None:
+        """Find the lowest value to which any key from the ranges is mapped (None if ranges are empty).
+
+        Intervals of values are checked from the lowest one - only until the first of them is reached from the ranges.
+
+        >>> PiecewiseLinear([10, 20], [0, 5, 0]).inverse.lowest_reachable([[12, 13], [30, 40]])
+        17
+        >>> PiecewiseLinear([5, 10], [0, 40, 0]).inverse.lowest_reachable([[1, 15], [3, 7]])
+        1
+        >>> PiecewiseLinear([0, 10], [0, 40, 0]).inverse.lowest_reachable([[3, 7], [2, 4], [5, 12]])
+        10
+        """
+        ranges = union_ranges(ranges)
+        if not ranges:
+            return None
+        range_ends = [end for _, end in ranges]
+
+        # Every interval has to be reached from keys between ranges[0][0] + min offset and ranges[-1][1] + max offset
+        lowest_key, highest_key = ranges[0][0], ranges[-1][1]
+        all_offsets = [offset for offsets in self.offsets for offset in offsets]
+        for start, end, offsets in self._intervals(lowest_key + min(all_offsets), highest_key + max(all_offsets)):
+            reached = []
+            for offset in offsets:
+                keys_start, keys_end = start - offset, end - offset
+                # First of the ranges which does not end before the keys start
+                index = bisect.bisect_left(range_ends, keys_start)
+                if index < len(ranges) and ranges[index][0] <= keys_end:
+                    reached.append(max(keys_start, ranges[index][0]) + offset)
+            if reached:
+                return min(reached)
+
+
 @dataclass(frozen=True)
 class MapRange:
     source_start: int
@@ -42,7 +230,7 @@ class MapRange:
 
 @dataclass(frozen=True)
 class Map:
-    # from_ and to added to handle cases when maps are not in order (todo)
+    # from_ and to are used to find maps between categories when maps are not in order
     from_: str
     to: str
     ranges: list[MapRange]
@@ -57,6 +245,33 @@ class Map:
 
         return cls(fl[0], fl[2], ranges)
 
+    @cached_property
+    def _ranges_arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Sorted source starts, source ends (exclusive) and offsets of the ranges"""
+        ranges = sorted(self.ranges, key=lambda x: x.source_start)
+        starts = np.array([range_.source_start for range_ in ranges], dtype=np.int64)
+        ends = starts + np.array([range_.len_ for range_ in ranges], dtype=np.int64)
+        offsets = np.array([range_.destination_start for range_ in ranges], dtype=np.int64) - starts
+        return starts, ends, offsets
+
+    def map_array(self, keys: np.ndarray) -> np.ndarray:
+        """Map every key (int64 array) - same as __getitem__ for each of them.
+
+        >>> Map.from_raw(['seed-to-soil map:', '50 98 2', '52 50 48']).map_array(np.array([0, 49, 50, 97, 98, 99, 100]))
+        array([  0,  49,  52,  99,  50,  51, 100])
+        >>> Map('a', 'b', [MapRange(50, 0, 5), MapRange(10, 100, 5)]).map_array(np.array([10, 50]))
+        array([100,   0])
+        """
+        starts, ends, offsets = self._ranges_arrays
+        if not starts.size:
+            return keys.copy()
+
+        # Last range starting not after the key - key is mapped if it is not past the end of that range
+        indices = np.searchsorted(starts, keys, side='right') - 1
+        indices_clipped = np.maximum(indices, 0)
+        is_mapped = (indices >= 0) & (keys < ends[indices_clipped])
+        return keys + np.where(is_mapped, offsets[indices_clipped], 0)
+
     def __getitem__(self, key: int) -> int:
         for range_ in self.ranges:
             try:
@@ -102,11 +317,32 @@ class Map:
 
         return mapped
 
+    def to_piecewise_linear(self) -> PiecewiseLinear:
+        """
+        >>> Map('a', 'b', [MapRange(50, 0, 5), MapRange(10, 100, 5)]).to_piecewise_linear()
+        PiecewiseLinear(starts=[10, 15, 50, 55], offsets=[0, 90, 0, -50, 0])
+        """
+        starts = []
+        offsets = [0]
+        for range_ in sorted(self.ranges, key=lambda x: x.source_start):
+            # Range starts right where the previous one ends
+            if starts and starts[-1] == range_.source_start:
+                offsets[-1] = range_.destination_start - range_.source_start
+            else:
+                starts.append(range_.source_start)
+                offsets.append(range_.destination_start - range_.source_start)
+            starts.append(range_.source_end + 1)
+            offsets.append(0)
+        return PiecewiseLinear.simplified(starts, offsets)
+
 
 @dataclass(frozen=True)
 class Almanac:
     maps: list[Map]
 
+    # How many composed mappings between pairs of categories are kept
+    composed_cache_size = 64
+
     @classmethod
     def from_raw(cls, data: list[str]) -> Self:
         maps = []
@@ -123,22 +359,89 @@ class Almanac:
 
         return cls(maps)
 
+    @property
+    def compiled(self) -> PiecewiseLinear:
+        """All maps folded into one function from seed to location (maps do not have to be in order)"""
+        return self.composed('seed', 'location')
+
     def __getitem__(self, key: int) -> int:
-        """Map seed to location"""
-        # Todo - handle case in which maps are not in order
-        for map_ in self.maps:
-            key = map_[key]
-        return key
+        """Map seed to location
 
-    def map_ranges(self, ranges: list[list[int, int]]) -> list[list[int, int]]:
+        >>> almanac = Almanac([Map('soil', 'location', [MapRange(0, 100, 10)]),
+        ...                    Map('seed', 'soil', [MapRange(50, 0, 10)])])
+        >>> almanac[55], almanac.map_array([55]), almanac.map_ranges([[50, 51]])
+        (105, array([105]), [[100, 101]])
+        """
+        return self.compiled[key]
+
+    def map_array(self, keys: np.ndarray) -> np.ndarray:
+        """Map seeds (int64 array) to locations"""
+        return self.compiled.map_array(np.asarray(keys, dtype=np.int64))
+
+    @cached_property
+    def _maps_by_source(self) -> dict[str, list[Map]]:
+        maps_by_source = {}
         for map_ in self.maps:
-            ranges = sorted(ranges, key=lambda x: x[0])
-            ranges = merge_ranges(ranges)
-            ranges = map_.map_ranges(ranges)
+            maps_by_source.setdefault(map_.from_, []).append(map_)
+        return maps_by_source
+
+    def find_maps_chain(self, from_: str, to: str) -> list[Map]:
+        """Find maps which have to be applied (in order) to get from one category to another.
+
+        >>> almanac = Almanac([Map('soil', 'water', []), Map('seed', 'soil', []), Map('water', 'light', [])])
+        >>> [(map_.from_, map_.to) for map_ in almanac.find_maps_chain('seed', 'water')]
+        [('seed', 'soil'), ('soil', 'water')]
+        """
+        # Breadth first search over categories
+        incoming_maps = {from_: None}
+        queue = deque([from_])
+        while queue:
+            category = queue.popleft()
+            if category == to:
+                break
+            for map_ in self._maps_by_source.get(category, []):
+                if map_.to not in incoming_maps:
+                    incoming_maps[map_.to] = map_
+                    queue.append(map_.to)
+        else:
+            raise ValueError(f'Category {to} cannot be reached from {from_}')
 
-        ranges = sorted(ranges, key=lambda x: x[0])
-        ranges = merge_ranges(ranges)
-        return ranges
+        chain = []
+        while incoming_maps[to] is not None:
+            chain.append(incoming_maps[to])
+            to = incoming_maps[to].from_
+        return chain[::-1]
+
+    def _compose(self, from_: str, to: str) -> PiecewiseLinear:
+        maps_chain = self.find_maps_chain(from_, to)
+        return functools.reduce(PiecewiseLinear.then, (map_.to_piecewise_linear() for map_ in maps_chain),
+                                PiecewiseLinear([], [0]))
+
+    @cached_property
+    def _composed_cache(self):
+        return functools.lru_cache(maxsize=self.composed_cache_size)(self._compose)
+
+    def composed(self, from_: str, to: str) -> PiecewiseLinear:
+        """Function mapping one category to another (memoised for the recently used pairs)"""
+        return self._composed_cache(from_, to)
+
+    def map_key(self, key: int, from_: str, to: str) -> int:
+        return self.composed(from_, to)[key]
+
+    def map_ranges_between(self, ranges: list[list[int, int]], from_: str, to: str) -> list[list[int, int]]:
+        return self.composed(from_, to).map_ranges(ranges)
+
+    def find_source_ranges(self, ranges: list[list[int, int]], from_: str = 'seed',
+                           to: str = 'location') -> list[list[int, int]]:
+        """Find ranges of from_ category values which are mapped into the ranges of to category values"""
+        return self.composed(from_, to).inverse.map_ranges(ranges)
+
+    def lowest_reachable(self, ranges: list[list[int, int]], from_: str = 'seed', to: str = 'location') -> int | None:
+        return self.composed(from_, to).inverse.lowest_reachable(ranges)
+
+    def map_ranges(self, ranges: list[list[int, int]]) -> list[list[int, int]]:
+        """Map seed ranges to location ranges"""
+        return self.composed('seed', 'location').map_ranges(ranges)
 
 
 def merge_ranges(ranges: list[list[int, int]]) -> list[list[int, int]]:
@@ -164,6 +467,21 @@ def merge_ranges(ranges: list[list[int, int]]) -> list[list[int, int]]:
     return merged
 
 
+def union_ranges(ranges: list[list[int, int]]) -> list[list[int, int]]:
+    """Sort ranges and merge those which overlap or touch each other.
+
+    >>> union_ranges([[1, 15], [3, 7], [20, 25], [16, 18]])
+    [[1, 18], [20, 25]]
+    """
+    union = []
+    for start, end in sorted(ranges, key=lambda x: x[0]):
+        if union and start <= union[-1][1] + 1:
+            union[-1][1] = max(union[-1][1], end)
+        else:
+            union.append([start, end])
+    return union
+
+
 if __name__ == '__main__':
     path = 'input.txt'
 
@@ -179,6 +497,4 @@ if __name__ == '__main__':
 
     seed_ranges = [[r[0], r[0] + r[1] - 1] for r in seed_ranges]
 
-    result_ranges = almanac.map_ranges(seed_ranges)
-
-    print(result_ranges[0][0])
+    print(almanac.lowest_reachable(seed_ranges))
@@ -1,5 +1,9 @@
 import functools
+import math
 import operator
+from collections.abc import Sequence
+
+import numpy as np
 
 
 def read(path: str) -> list[str]:
@@ -52,6 +56,78 @@ def num_winning_strategies(race: dict) -> int:
     return winning_strategies
 
 
+def num_winning_strategies_closed_form(race: dict) -> int:
+    """Count wait times w for which w * (time - w) > best_distance using roots of the quadratic equation.
+
+    >>> [num_winning_strategies_closed_form({'time': t, 'best_distance': d}) for t, d in [(7, 9), (15, 40), (30, 200)]]
+    [4, 8, 9]
+    >>> num_winning_strategies_closed_form({'time': 71530, 'best_distance': 940200})
+    71503
+    >>> num_winning_strategies_closed_form({'time': 3, 'best_distance': 2})
+    0
+    """
+    time = race['time']
+    best_distance = race['best_distance']
+
+    discriminant = time * time - 4 * best_distance
+    if discriminant <= 0:
+        return 0
+
+    # Shortest winning wait time is just above (time - sqrt(discriminant)) / 2 - isqrt rounds down, so fix it up
+    wait_time = (time - math.isqrt(discriminant)) // 2
+    while 2 * wait_time <= time and calc_distance(wait_time, time) <= best_distance:
+        wait_time += 1
+    while wait_time > 0 and calc_distance(wait_time - 1, time) > best_distance:
+        wait_time -= 1
+
+    # Winning wait times are symmetric around time / 2
+    return max(time - 2 * wait_time + 1, 0)
+
+
+# Races with times and distances below these limits are solved with int64 arrays without overflows
+_VECTORIZED_TIME_LIMIT = 2 ** 31
+_VECTORIZED_DISTANCE_LIMIT = 2 ** 60
+
+
+def _num_winning_strategies_vectorized(times: np.ndarray, best_distances: np.ndarray) -> np.ndarray:
+    discriminants = np.maximum(times * times - 4 * best_distances, 0)
+    roots = np.sqrt(discriminants.astype(np.float64)).astype(np.int64)
+
+    # Start below the shortest winning wait time (float sqrt may be slightly off) and move up to it
+    wait_times = np.maximum((times - roots) // 2 - 2, 0)
+    while True:
+        is_losing = (2 * wait_times <= times) & (wait_times * (times - wait_times) <= best_distances)
+        if not is_losing.any():
+            break
+        wait_times += is_losing
+
+    return np.maximum(times - 2 * wait_times + 1, 0)
+
+
+def num_winning_strategies_batch(times: Sequence[int], best_distances: Sequence[int]) -> np.ndarray:
+    """Number of winning strategies for every race.
+
+    The result is int64 array, or object array if some of the races are too big to be solved with int64.
+
+    >>> num_winning_strategies_batch([7, 15, 30], [9, 40, 200])
+    array([4, 8, 9])
+    >>> num_winning_strategies_batch([7, 10 ** 20], [9, 10 ** 38])
+    array([4, 97979589711327123927], dtype=object)
+    """
+    times = np.asarray(times, dtype=object)
+    best_distances = np.asarray(best_distances, dtype=object)
+
+    is_safe = ((times >= 0) & (times < _VECTORIZED_TIME_LIMIT)
+               & (best_distances >= 0) & (best_distances < _VECTORIZED_DISTANCE_LIMIT)).astype(bool)
+
+    counts = np.zeros(len(times), dtype=np.int64 if is_safe.all() else object)
+    counts[is_safe] = _num_winning_strategies_vectorized(times[is_safe].astype(np.int64),
+                                                         best_distances[is_safe].astype(np.int64))
+    counts[~is_safe] = [num_winning_strategies_closed_form({'time': time, 'best_distance': best_distance})
+                        for time, best_distance in zip(times[~is_safe], best_distances[~is_safe])]
+    return counts
+
+
 # Part 2
 
 def parse_one_race(data: list[str]) -> dict:
@@ -68,9 +144,9 @@ if __name__ == '__main__':
     races = parse(data)
 
     # Part 1
-    res = functools.reduce(operator.mul, (num_winning_strategies(race) for race in races))
+    res = functools.reduce(operator.mul, (num_winning_strategies_closed_form(race) for race in races))
     print(res)
 
     # Part 2
     race = parse_one_race(data)
-    print(num_winning_strategies(race))
+    print(num_winning_strategies_closed_form(race))
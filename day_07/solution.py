@@ -1,8 +1,12 @@
-from collections import Counter
-from dataclasses import dataclass
+from array import array
+from collections import Counter, deque
+from collections.abc import Iterable
+from dataclasses import dataclass, field
 from functools import cached_property
 from typing import Self
 
+import numpy as np
+
 
 def read(path: str) -> list[str]:
     with open(path, 'r', encoding='utf-8') as f:
@@ -26,6 +30,21 @@ def rank2val(rank: str) -> int:
         return int(rank)
 
 
+# Hand types from the weakest to the strongest
+_type_classes = {type_: index for index, type_ in enumerate([
+    (1, 1, 1, 1, 1),
+    (2, 1, 1, 1),
+    (2, 2, 1),
+    (3, 1, 1),
+    (3, 2),
+    (4, 1),
+    (5,),
+])}
+
+# Card values are lower than 15, so they can be encoded as base-15 digits
+_values_base = 15
+
+
 @dataclass
 class Hand:
     cards: str
@@ -44,6 +63,20 @@ class Hand:
     def values(self) -> tuple:
         return tuple(rank2val(c) for c in self.cards)
 
+    @cached_property
+    def strength(self) -> int:
+        """Single integer which orders hands in the same way as comparing them (type class and then card values).
+
+        >>> Hand('32T3K', 765).strength < Hand('KTJJT', 220).strength < Hand('KK677', 28).strength
+        True
+        >>> HandWithJoker('KTJJT', 220).strength > HandWithJoker('QQQJA', 483).strength
+        True
+        """
+        strength = _type_classes[self.type]
+        for value in self.values:
+            strength = strength * _values_base + value
+        return strength
+
     def __lt__(self, other: Self) -> bool:
         if not isinstance(other, type(self)):
             raise NotImplemented
@@ -79,6 +112,275 @@ class HandWithJoker(Hand):
         return tuple(v if v != _rank2val['J'] else 1 for v in vals)
 
 
+def total_winnings(hands: list[Hand]) -> int:
+    """
+    >>> data = ['32T3K 765', 'T55J5 684', 'KK677 28', 'KTJJT 220', 'QQQJA 483']
+    >>> total_winnings([Hand.from_str(line) for line in data])
+    6440
+    >>> total_winnings([HandWithJoker.from_str(line) for line in data])
+    5905
+    """
+    strengths = np.array([hand.strength for hand in hands], dtype=np.int64)
+    bids = np.array([hand.bid for hand in hands], dtype=np.int64)
+
+    order = np.argsort(strengths, kind='stable')
+    return int(np.dot(bids[order], np.arange(1, len(hands) + 1, dtype=np.int64)))
+
+
+# Counting sort - dense keys (type class followed by base-13 card indices) index a fixed-size histogram
+
+_card_order = '23456789TJQKA'
+_card_order_with_jokers = 'J23456789TQKA'
+_keys_cnt = len(_type_classes) * len(_card_order) ** 5
+
+
+def hand_key(cards: str, with_jokers: bool = False) -> int:
+    """Dense key of a hand - lower than _keys_cnt and ordered in the same way as Hand / HandWithJoker.
+
+    >>> hand_key('23456') < hand_key('22345') < hand_key('22222') < hand_key('AAAAA') < _keys_cnt
+    True
+    >>> hand_key('JJJJ2', with_jokers=True) > hand_key('AAAAK', with_jokers=True)
+    True
+    """
+    counts = Counter(cards)
+    if with_jokers and 0 < counts['J'] < 5:
+        jokers_cnt = counts.pop('J')
+        counts[counts.most_common(1)[0][0]] += jokers_cnt
+    type_ = tuple(sorted(counts.values(), reverse=True))
+
+    card_order = _card_order_with_jokers if with_jokers else _card_order
+    key = _type_classes[type_]
+    for card in cards:
+        key = key * len(card_order) + card_order.index(card)
+    return key
+
+
+def total_winnings_streaming(lines: Iterable[str], with_jokers: bool = False) -> int:
+    """Total winnings without sorting the hands - memory does not depend on the number of hands.
+
+    Ties are ranked in the order of appearance, like in sorted().
+
+    >>> data = ['32T3K 765', 'T55J5 684', 'KK677 28', 'KTJJT 220', 'QQQJA 483']
+    >>> total_winnings_streaming(data), total_winnings_streaming(data, with_jokers=True)
+    (6440, 5905)
+    """
+    counts = array('q', bytes(8 * _keys_cnt))
+    bids = array('q', bytes(8 * _keys_cnt))
+    # Sum of bids multiplied by the number of equal hands seen before them
+    ties_sum = 0
+
+    for line in lines:
+        cards, bid = line.split()
+        bid = int(bid)
+        key = hand_key(cards, with_jokers)
+
+        ties_sum += counts[key] * bid
+        counts[key] += 1
+        bids[key] += bid
+
+    counts = np.frombuffer(counts, dtype=np.int64)
+    bids = np.frombuffer(bids, dtype=np.int64)
+
+    # Rank of the first hand with given key is 1 + number of all weaker hands
+    first_ranks = np.cumsum(counts) - counts + 1
+    # Multiply as Python integers, so the sum does not overflow
+    return int(np.dot(first_ranks.astype(object), bids.astype(object))) + ties_sum
+
+
+# Online leaderboard
+
+@dataclass
+class FenwickTree:
+    """Prefix sums over indices 0 .. size - 1 with O(log size) updates.
+
+    >>> tree = FenwickTree(10)
+    >>> tree.add(2, 5)
+    >>> tree.add(7, 1)
+    >>> tree.prefix_sum(1), tree.prefix_sum(2), tree.prefix_sum(9), tree.find(6)
+    (0, 5, 6, 7)
+    >>> tree.append(3)
+    >>> tree.size, tree.prefix_sum(10), tree.find(9)
+    (11, 9, 10)
+    """
+    size: int
+    tree: array = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        self.tree = array('q', bytes(8 * (self.size + 1)))
+
+    def add(self, index: int, value: int) -> None:
+        index += 1
+        while index <= self.size:
+            self.tree[index] += value
+            index += index & -index
+
+    def append(self, value: int) -> None:
+        """Add index size with given value"""
+        self.size += 1
+        index = self.size
+        # Node covers indices index - lowbit(index) + 1 .. index, sum the nodes covering all but the last one
+        total = value
+        child = index - 1
+        while child > index - (index & -index):
+            total += self.tree[child]
+            child -= child & -child
+        self.tree.append(total)
+
+    def prefix_sum(self, index: int) -> int:
+        """Sum of values at indices 0 .. index"""
+        total = 0
+        index += 1
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+    def find(self, value: int) -> int:
+        """Lowest index with prefix sum >= value (values must not be negative)"""
+        index = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            if index + step <= self.size and self.tree[index + step] < value:
+                index += step
+                value -= self.tree[index]
+            step >>= 1
+        return index
+
+
+@dataclass
+class EqualHands:
+    """Hands with the same key (so the same cards) in the order of insertion.
+
+    Every inserted hand gets a new slot, removed hands leave empty slots behind.
+    """
+    cards: str
+    counts: FenwickTree = field(default_factory=lambda: FenwickTree(0), init=False, repr=False)
+    bids: FenwickTree = field(default_factory=lambda: FenwickTree(0), init=False, repr=False)
+    slot_bids: list[int] = field(default_factory=list, init=False, repr=False)
+    # Occupied slots of every bid in the order of insertion
+    bid_slots: dict[int, deque[int]] = field(default_factory=dict, init=False, repr=False)
+
+    def __len__(self) -> int:
+        return self.counts.prefix_sum(self.counts.size - 1)
+
+    def append(self, bid: int) -> None:
+        self.bid_slots.setdefault(bid, deque()).append(len(self.slot_bids))
+        self.slot_bids.append(bid)
+        self.counts.append(1)
+        self.bids.append(bid)
+
+    def remove(self, bid: int) -> tuple[int, int]:
+        """Remove the first inserted hand with given bid.
+
+        Returns its index among equal hands and the sum of bids of equal hands inserted later.
+        """
+        slots = self.bid_slots.get(bid)
+        if not slots:
+            raise KeyError((self.cards, bid))
+        slot = slots.popleft()
+        if not slots:
+            del self.bid_slots[bid]
+
+        index = self.counts.prefix_sum(slot) - 1
+        later_bids = self.bids.prefix_sum(self.bids.size - 1) - self.bids.prefix_sum(slot)
+
+        self.counts.add(slot, -1)
+        self.bids.add(slot, -bid)
+        return index, later_bids
+
+    def bid_at(self, index: int) -> int:
+        return self.slot_bids[self.counts.find(index + 1)]
+
+
+@dataclass
+class Leaderboard:
+    """Hands ranked by hand_key, total winnings are updated on every insert / remove.
+
+    Equal hands are ranked in the order of insertion. All operations take O(log(keys) + log(equal hands)).
+
+    >>> leaderboard = Leaderboard()
+    >>> for line in ['32T3K 765', 'T55J5 684', 'KK677 28', 'KTJJT 220', 'QQQJA 483']:
+    ...     leaderboard.insert(*line.split())
+    >>> leaderboard.total_winnings, leaderboard.hand_at(1), leaderboard.rank_of('QQQJA')
+    (6440, ('32T3K', 765), 5)
+    >>> leaderboard.remove('KK677', 28)
+    >>> leaderboard.total_winnings == total_winnings([Hand.from_str(line) for line in ['32T3K 765', 'T55J5 684',
+    ...                                                                                 'KTJJT 220', 'QQQJA 483']])
+    True
+    >>> for line in ['KK677 1', 'KK677 2', 'KK677 1']:
+    ...     leaderboard.insert(*line.split())
+    >>> leaderboard.remove('KK677', 1)
+    >>> leaderboard.rank_of('KK677'), leaderboard.hand_at(3), leaderboard.hand_at(4)
+    (3, ('KK677', 2), ('KK677', 1))
+    >>> leaderboard.total_winnings == total_winnings([Hand.from_str(line) for line in ['32T3K 765', 'T55J5 684',
+    ...                                                                                 'KTJJT 220', 'QQQJA 483',
+    ...                                                                                 'KK677 2', 'KK677 1']])
+    True
+    """
+    with_jokers: bool = False
+    total_winnings: int = field(default=0, init=False)
+    counts: FenwickTree = field(default=None, init=False, repr=False)
+    bids: FenwickTree = field(default=None, init=False, repr=False)
+    hands: dict[int, EqualHands] = field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self):
+        self.counts = FenwickTree(_keys_cnt)
+        self.bids = FenwickTree(_keys_cnt)
+
+    def __len__(self) -> int:
+        return self.counts.prefix_sum(_keys_cnt - 1)
+
+    def _stronger_bids(self, key: int) -> int:
+        return self.bids.prefix_sum(_keys_cnt - 1) - self.bids.prefix_sum(key)
+
+    def insert(self, cards: str, bid: int | str) -> None:
+        bid = int(bid)
+        key = hand_key(cards, self.with_jokers)
+
+        # New hand goes after all weaker and equal hands, stronger hands move one rank up
+        rank = self.counts.prefix_sum(key) + 1
+        self.total_winnings += rank * bid + self._stronger_bids(key)
+
+        self.counts.add(key, 1)
+        self.bids.add(key, bid)
+        if key not in self.hands:
+            self.hands[key] = EqualHands(cards)
+        self.hands[key].append(bid)
+
+    def remove(self, cards: str, bid: int | str) -> None:
+        bid = int(bid)
+        key = hand_key(cards, self.with_jokers)
+
+        if key not in self.hands:
+            raise KeyError((cards, bid))
+        equal_hands = self.hands[key]
+        index, later_equal_bids = equal_hands.remove(bid)
+
+        # Equal hands inserted later and all stronger hands move one rank down
+        rank = self.counts.prefix_sum(key - 1) + index + 1
+        self.total_winnings -= rank * bid + later_equal_bids + self._stronger_bids(key)
+
+        self.counts.add(key, -1)
+        self.bids.add(key, -bid)
+        if not len(equal_hands):
+            del self.hands[key]
+
+    def hand_at(self, rank: int) -> tuple[str, int]:
+        """Cards and bid of the hand with given rank (1 is the weakest)"""
+        if not 1 <= rank <= len(self):
+            raise IndexError(rank)
+        key = self.counts.find(rank)
+        equal_hands = self.hands[key]
+        return equal_hands.cards, equal_hands.bid_at(rank - self.counts.prefix_sum(key - 1) - 1)
+
+    def rank_of(self, cards: str) -> int:
+        """Rank of the first inserted hand with given cards"""
+        key = hand_key(cards, self.with_jokers)
+        if key not in self.hands:
+            raise KeyError(cards)
+        return self.counts.prefix_sum(key - 1) + 1
+
+
 if __name__ == '__main__':
     path = 'input.txt'
 
@@ -86,9 +388,9 @@ if __name__ == '__main__':
     hands = [Hand.from_str(line) for line in data]
 
     # Part 1
-    print(sum(index * hand.bid for index, hand in enumerate(sorted(hands), 1)))
+    print(total_winnings(hands))
 
     # Part 2
     hands_jokers = [HandWithJoker.from_str(line) for line in data]
 
-    print(sum(index * hand.bid for index, hand in enumerate(sorted(hands_jokers), 1)))
+    print(total_winnings(hands_jokers))
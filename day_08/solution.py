@@ -1,5 +1,9 @@
 import itertools
-from typing import Callable
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Callable, Self
+
+import numpy as np
 
 
 def read(path: str) -> list[str]:
@@ -119,10 +123,257 @@ def lcm(numbers: list[int]) -> int:
     if len(numbers) < 2:
         raise ValueError
     if len(numbers) == 2:
-        return int(numbers[0] * numbers[1] / gcd(*numbers))
+        return numbers[0] * numbers[1] // gcd(*numbers)
     return lcm([numbers[0], lcm(numbers[1:])])
 
 
+@dataclass
+class GhostCycle:
+    """Steps at which the ghost is in the ending node.
+
+    States (node, instruction index) repeat every length steps starting from cycle_start step.
+    """
+    cycle_start: int
+    length: int
+    # Steps lower than cycle_start
+    hits_before_cycle: list[int]
+    # Steps from cycle_start to cycle_start + length - 1, repeated every length steps
+    hits_in_cycle: list[int]
+
+    def is_hit(self, step: int) -> bool:
+        if step < self.cycle_start:
+            return step in self.hits_before_cycle
+        return (step - self.cycle_start) % self.length + self.cycle_start in self.hits_in_cycle
+
+
+def find_cycle(from_node: str, is_ending_node: Callable[[str], bool], instructions: str,
+               nodes: dict[str, dict[str, str]]) -> GhostCycle:
+    """
+    >>> nodes = parse_nodes(['11A = (11B, XXX)', '11B = (XXX, 11Z)', '11Z = (11B, XXX)', 'XXX = (XXX, XXX)'])
+    >>> find_cycle('11A', lambda x: x.endswith('Z'), 'LR', nodes)
+    GhostCycle(cycle_start=2, length=2, hits_before_cycle=[], hits_in_cycle=[2])
+    """
+    # Every pass over the instructions starts with the same instruction, so it is enough to remember the nodes
+    # in which passes start - the state repeats when one of them is visited again
+    passes_starts = {}
+    hits = []
+    current_node = from_node
+    step_index = 0
+    while current_node not in passes_starts:
+        passes_starts[current_node] = step_index
+        for next_step in instructions:
+            if is_ending_node(current_node):
+                hits.append(step_index)
+            current_node = nodes[current_node][next_step]
+            step_index += 1
+
+    cycle_start = passes_starts[current_node]
+    return GhostCycle(cycle_start, step_index - cycle_start,
+                      [h for h in hits if h < cycle_start], [h for h in hits if h >= cycle_start])
+
+
+def combine_congruences(remainder_1: int, modulus_1: int, remainder_2: int, modulus_2: int) -> tuple[int, int] | None:
+    """Generalised chinese remainder theorem - moduli do not have to be coprime.
+
+    Returns (remainder, modulus) of numbers x such that x = remainder_1 (mod modulus_1) and x = remainder_2
+    (mod modulus_2), or None if there are no such numbers.
+
+    >>> combine_congruences(2, 3, 3, 5)
+    (8, 15)
+    >>> combine_congruences(2, 4, 4, 6)
+    (10, 12)
+    >>> combine_congruences(1, 4, 2, 6) is None
+    True
+    """
+    divisor = gcd(modulus_1, modulus_2)
+    if (remainder_2 - remainder_1) % divisor:
+        return None
+
+    modulus = modulus_1 // divisor * modulus_2
+    k = (remainder_2 - remainder_1) // divisor * pow(modulus_1 // divisor, -1, modulus_2 // divisor)
+    return (remainder_1 + modulus_1 * k) % modulus, modulus
+
+
+def count_steps_cycles(initial_nodes: list[str], is_ending_node: Callable[[str], bool],
+                       instructions: str, nodes: dict[str, dict[str, str]]) -> int | None:
+    """Number of steps after which all ghosts are in ending nodes at once (None if it never happens).
+
+    >>> nodes = parse_nodes(['11A = (11B, XXX)', '11B = (XXX, 11Z)', '11Z = (11B, XXX)', '22A = (22B, XXX)',
+    ...                      '22B = (22C, 22C)', '22C = (22Z, 22Z)', '22Z = (22B, 22B)', 'XXX = (XXX, XXX)'])
+    >>> count_steps_cycles(['11A', '22A'], lambda x: x.endswith('Z'), 'LR', nodes)
+    6
+    """
+    cycles = [find_cycle(node, is_ending_node, instructions, nodes) for node in initial_nodes]
+
+    # Before all ghosts are in their cycles, at least one of them has to hit an ending node before its cycle
+    all_in_cycles = max(cycle.cycle_start for cycle in cycles)
+    for step_index in sorted(set(h for cycle in cycles for h in cycle.hits_before_cycle if h < all_in_cycles)):
+        if all(cycle.is_hit(step_index) for cycle in cycles):
+            return step_index
+
+    # Then every ghost hits ending nodes periodically - combine remainders of all ghosts
+    congruences = {(0, 1)}
+    for cycle in cycles:
+        combined = set()
+        for remainder, modulus in congruences:
+            for hit in cycle.hits_in_cycle:
+                congruence = combine_congruences(remainder, modulus, hit % cycle.length, cycle.length)
+                if congruence is not None:
+                    combined.add(congruence)
+        congruences = combined
+
+    if not congruences:
+        return None
+    # Lowest step with given remainder which is not before all_in_cycles
+    return min(remainder + max(-((remainder - all_in_cycles) // modulus), 0) * modulus
+               for remainder, modulus in congruences)
+
+
+@dataclass
+class CompiledNetwork:
+    """Network with nodes interned to ints, compiled for the given instructions.
+
+    pass_targets[node] is the node reached after one full pass over the instructions, pass_first_ends[node] is the
+    lowest number of steps (1 .. len(instructions)) within that pass after which an ending node is reached, -1 if none.
+    """
+    names: list[str]
+    ids: dict[str, int]
+    left: np.ndarray
+    right: np.ndarray
+    is_end: np.ndarray
+    instructions: str
+    pass_targets: np.ndarray = field(default=None, init=False, repr=False)
+    pass_first_ends: np.ndarray = field(default=None, init=False, repr=False)
+    # jumps[k][node] is the node reached after 2 ** k passes
+    jumps: list[np.ndarray] = field(default_factory=list, init=False, repr=False)
+
+    def __post_init__(self):
+        current_nodes = np.arange(len(self.names), dtype=np.int32)
+        first_ends = np.full(len(self.names), -1, dtype=np.int64)
+        for step_index, next_step in enumerate(self.instructions, 1):
+            current_nodes = (self.left if next_step == 'L' else self.right)[current_nodes]
+            first_ends[(first_ends == -1) & self.is_end[current_nodes]] = step_index
+
+        self.pass_targets = current_nodes
+        self.pass_first_ends = first_ends
+        self.jumps = [current_nodes]
+
+    @classmethod
+    def from_nodes(cls, nodes: dict[str, dict[str, str]], instructions: str,
+                   is_ending_node: Callable[[str], bool] = lambda x: x.endswith('Z')) -> Self:
+        names = list(nodes.keys())
+        ids = {name: id_ for id_, name in enumerate(names)}
+        left = np.array([ids[nodes[name]['L']] for name in names], dtype=np.int32)
+        right = np.array([ids[nodes[name]['R']] for name in names], dtype=np.int32)
+        is_end = np.array([is_ending_node(name) for name in names], dtype=bool)
+        return cls(names, ids, left, right, is_end, instructions)
+
+    def node_after(self, from_node: str, steps: int) -> str:
+        """Node reached after given number of steps - O(log steps) jumps over whole passes.
+
+        >>> network = CompiledNetwork.from_nodes(parse_nodes(['AAA = (BBB, BBB)', 'BBB = (AAA, ZZZ)',
+        ...                                                   'ZZZ = (ZZZ, ZZZ)']), 'LLR')
+        >>> [network.node_after('AAA', steps) for steps in range(7)]
+        ['AAA', 'BBB', 'AAA', 'BBB', 'AAA', 'BBB', 'ZZZ']
+        """
+        passes, steps = divmod(steps, len(self.instructions))
+
+        node = self.ids[from_node]
+        level = 0
+        while passes:
+            if level == len(self.jumps):
+                self.jumps.append(self.jumps[-1][self.jumps[-1]])
+            if passes & 1:
+                node = self.jumps[level][node]
+            passes >>= 1
+            level += 1
+
+        for next_step in self.instructions[:steps]:
+            node = (self.left if next_step == 'L' else self.right)[node]
+        return self.names[node]
+
+    def count_steps(self, from_node: str) -> int | None:
+        """Steps to the first ending node, going over whole passes (None if no ending node is ever reached).
+
+        >>> network = CompiledNetwork.from_nodes(parse_nodes(['AAA = (BBB, BBB)', 'BBB = (AAA, ZZZ)',
+        ...                                                   'ZZZ = (ZZZ, ZZZ)']), 'LLR')
+        >>> network.count_steps('AAA')
+        6
+        """
+        node = self.ids[from_node]
+        if self.is_end[node]:
+            return 0
+
+        steps = 0
+        visited = set()
+        while node not in visited:
+            first_end = self.pass_first_ends[node]
+            if first_end != -1:
+                return steps + int(first_end)
+            visited.add(node)
+            node = self.pass_targets[node]
+            steps += len(self.instructions)
+        return None
+
+    def _walk(self, initial_nodes: list[str]) -> Iterable[tuple[int, np.ndarray]]:
+        """Move all walkers at once - yield step index and positions of all walkers after every step"""
+        # Successors for every instruction - every step is a single gather
+        step_targets = [self.left if next_step == 'L' else self.right for next_step in self.instructions]
+
+        current_nodes = np.array([self.ids[node] for node in initial_nodes], dtype=np.int32)
+        for step_index, targets in enumerate(itertools.cycle(step_targets), 1):
+            current_nodes = targets[current_nodes]
+            yield step_index, current_nodes
+
+    def simulate(self, initial_nodes: list[str], steps: int) -> dict[str, list[dict]]:
+        """Same result as simulate() with the ending nodes of this network.
+
+        >>> network = CompiledNetwork.from_nodes(parse_nodes(['11A = (11B, XXX)', '11B = (XXX, 11Z)',
+        ...                                                   '11Z = (11B, XXX)', 'XXX = (XXX, XXX)']), 'LR')
+        >>> network.simulate(['11A'], 5)
+        {'11A': [{'ending_node': '11Z', 'steps': 2}, {'ending_node': '11Z', 'steps': 4}]}
+        """
+        ending_nodes_positions = {node: [] for node in initial_nodes}
+        if steps < 1:
+            return ending_nodes_positions
+
+        for step_index, current_nodes in self._walk(initial_nodes):
+            is_end = self.is_end[current_nodes]
+            if is_end.any():
+                for walker_index in np.flatnonzero(is_end):
+                    ending_nodes_positions[initial_nodes[walker_index]].append(
+                        {'ending_node': self.names[current_nodes[walker_index]], 'steps': step_index})
+
+            if step_index == steps:
+                return ending_nodes_positions
+
+    def count_steps_many_nodes(self, initial_nodes: list[str], max_steps: int) -> int | None:
+        """Steps after which all walkers are in ending nodes at once (None if not found within max_steps).
+
+        Walkers are simulated step by step, so the search has to be bounded - use count_steps_cycles for answers which
+        are too far away to be simulated.
+
+        >>> network = CompiledNetwork.from_nodes(parse_nodes(['11A = (11B, XXX)', '11B = (XXX, 11Z)',
+        ...                                                   '11Z = (11B, XXX)', '22A = (22B, XXX)',
+        ...                                                   '22B = (22C, 22C)', '22C = (22Z, 22Z)',
+        ...                                                   '22Z = (22B, 22B)', 'XXX = (XXX, XXX)']), 'LR')
+        >>> network.count_steps_many_nodes(['11A', '22A'], 100)
+        6
+        >>> network.count_steps_many_nodes(['11A', '22A'], 5) is None
+        True
+        """
+        if all(self.is_end[self.ids[node]] for node in initial_nodes):
+            return 0
+        if max_steps <= 0:
+            return None
+
+        for step_index, current_nodes in self._walk(initial_nodes):
+            if self.is_end[current_nodes].all():
+                return step_index
+            if step_index >= max_steps:
+                return None
+
+
 if __name__ == '__main__':
     path = 'input.txt'
 
@@ -131,25 +382,10 @@ if __name__ == '__main__':
     nodes = parse_nodes(data[2:])
 
     # Part 1
-    steps = count_steps('AAA', 'ZZZ', instructions, nodes)
-    print(steps)
+    network = CompiledNetwork.from_nodes(nodes, instructions, lambda x: x == 'ZZZ')
+    print(network.count_steps('AAA'))
 
     # Part 2
     initial_nodes = [n for n in nodes.keys() if n.endswith('A')]
 
-    res = simulate(initial_nodes, lambda x: x.endswith('Z'), 100000, instructions, nodes)
-    # Assumptions for LCM  (for each initial node)
-    for initial_node, ending_steps in res.items():
-        # Always ends in the same ending node
-        assert len(set(e['ending_node'] for e in ending_steps)) == 1
-
-        first_ending_step = ending_steps[0]['steps']
-        # Instructions cycle ends in the ending node
-        assert first_ending_step % len(instructions) == 0
-
-        # Fixed number of steps between ending nodes (cycles between endings, no initial offset)
-        for index, e in enumerate(ending_steps, 1):
-            assert e['steps'] / first_ending_step == index
-
-    steps_to_first_ending = [r[0]['steps'] for r in res.values()]
-    print(lcm(steps_to_first_ending))
+    print(count_steps_cycles(initial_nodes, lambda x: x.endswith('Z'), instructions, nodes))
@@ -1,4 +1,9 @@
+import functools
+import math
 from collections.abc import Sequence, Iterable
+from dataclasses import dataclass, field
+
+import numpy as np
 
 
 def read(path: str) -> list[str]:
@@ -36,14 +41,109 @@ def predict_backward(observations: Sequence[int]) -> int:
     return predict(reversed(observations))
 
 
+# Closed form - the next value is a combination of observations with alternating binomial coefficients
+
+@functools.cache
+def extrapolation_coefficients(length: int) -> tuple[int, ...]:
+    """Coefficients c such that predict(observations) == sum(c[i] * observations[i]).
+
+    >>> extrapolation_coefficients(3)
+    (1, -3, 3)
+    """
+    return tuple((-1) ** (length - 1 - i) * math.comb(length, i) for i in range(length))
+
+
+def predict_closed_form(observations: Sequence[int]) -> int:
+    """
+    >>> predict_closed_form([10, 13, 16, 21, 30, 45])
+    68
+    """
+    return sum(c * o for c, o in zip(extrapolation_coefficients(len(observations)), observations))
+
+
+def predict_backward_closed_form(observations: Sequence[int]) -> int:
+    """
+    >>> predict_backward_closed_form([10, 13, 16, 21, 30, 45])
+    5
+    """
+    return sum(c * o for c, o in zip(reversed(extrapolation_coefficients(len(observations))), observations))
+
+
+def predict_many(data: list[list[int]]) -> tuple[np.ndarray, np.ndarray]:
+    """Forward and backward predictions for all histories - one matrix-vector product per length and direction.
+
+    Predictions are int64, or Python ints (object dtype) if int64 could overflow.
+
+    >>> predict_many([[0, 3, 6, 9, 12, 15], [1, 3, 6, 10, 15, 21], [10, 13, 16, 21, 30, 45]])
+    (array([18, 28, 68]), array([-3,  0,  5]))
+    """
+    histories_by_length = {}
+    for index, history in enumerate(data):
+        histories_by_length.setdefault(len(history), []).append(index)
+
+    max_abs_value = max((abs(value) for history in data for value in history), default=0)
+    is_safe = all(sum(math.comb(length, i) for i in range(length)) * max_abs_value < 2 ** 62
+                  for length in histories_by_length)
+    dtype = np.int64 if is_safe else object
+
+    forward = np.zeros(len(data), dtype=dtype)
+    backward = np.zeros(len(data), dtype=dtype)
+    for length, indices in histories_by_length.items():
+        histories = np.array([data[index] for index in indices], dtype=dtype).reshape(len(indices), length)
+        coefficients = np.array(extrapolation_coefficients(length), dtype=dtype)
+        forward[indices] = histories @ coefficients
+        backward[indices] = histories @ coefficients[::-1]
+
+    return forward, backward
+
+
+@dataclass
+class OnlinePredictor:
+    """Forward prediction updated with every appended observation.
+
+    Only the last value of every difference row is kept (the trailing diagonal of create_diff_matrix), without
+    the trailing zeros - so its length is bounded by the degree of the polynomial followed by the observations.
+
+    >>> predictor = OnlinePredictor()
+    >>> [predictor.append(value) for value in [10, 13, 16, 21, 30, 45]]
+    [10, 16, 19, 30, 45, 68]
+    >>> predictor.diagonal
+    [45, 15, 6, 2]
+    """
+    diagonal: list[int] = field(default_factory=list)
+    count: int = 0
+
+    def append(self, observation: int) -> int:
+        """Add the observation and return the prediction of the next one"""
+        diagonal = [observation]
+        for last_value in self.diagonal:
+            diagonal.append(diagonal[-1] - last_value)
+
+        # Deeper rows ended with zeros, so their new last values are all the same
+        if diagonal[-1] != 0:
+            diagonal.extend([diagonal[-1]] * (self.count - len(self.diagonal)))
+        while diagonal and diagonal[-1] == 0:
+            diagonal.pop()
+
+        self.diagonal = diagonal
+        self.count += 1
+        return self.prediction
+
+    @property
+    def prediction(self) -> int:
+        return sum(self.diagonal)
+
+
 if __name__ == '__main__':
     path = 'input.txt'
 
     data = read(path)
     data = [[int(val) for val in line.split()] for line in data]
 
+    forward, backward = predict_many(data)
+
     # Part 1
-    print(sum(predict(line) for line in data))
+    print(forward.sum())
 
     # Part 2
-    print(sum(predict_backward(line) for line in data))
+    print(backward.sum())
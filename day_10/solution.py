@@ -35,6 +35,27 @@ pipe_connections = {
 }
 
 
+_directions = list(Direction)
+
+
+def _build_transitions() -> list[list[int | None]]:
+    """Byte grid tracer table - (pipe byte, index of the direction we moved in) -> index of the direction to move next.
+
+    >>> _build_transitions()[ord('L')][_directions.index(Direction.SOUTH)] == _directions.index(Direction.EAST)
+    True
+    """
+    transitions = [[None] * len(_directions) for _ in range(256)]
+    for pipe, connections in pipe_connections.items():
+        for connection in connections:
+            # Entering the pipe through this connection means moving in the opposite direction
+            outgoing = next(iter(connections - {connection}))
+            transitions[ord(pipe)][_directions.index(connection.opposite)] = _directions.index(outgoing)
+    return transitions
+
+
+_transitions = _build_transitions()
+
+
 class PositionVisit(NamedTuple):
     position: Position
     coming_from: Direction
@@ -130,6 +151,63 @@ def find_pipe_pos_with_dists(data: list[list[str]]) -> dict[Position, int]:
         position_2 = next_position_2
 
 
+def trace_loop(data: list[str], start_char: str = 'S') -> tuple[bytearray, int, str]:
+    """Follow the loop on a flat byte grid - return loop membership mask, the loop length and the pipe under start.
+
+    The grid is surrounded with '.', mask[(row + 1) * (width + 2) + col + 1] is 1 for loop cells.
+
+    >>> mask, loop_len, start_pipe = trace_loop(['..F7.', '.FJ|.', 'SJ.L7', '|F--J', 'LJ...'])
+    >>> loop_len, loop_len // 2, sum(mask), start_pipe
+    (16, 8, 16, 'F')
+    >>> trace_loop(['S-7', '|.|', 'L-.'])
+    Traceback (most recent call last):
+    ...
+    ValueError: Pipe loop is broken at row 2, column 2
+    """
+    width = len(data[0]) + 2
+    grid = bytearray(b'.' * width)
+    for row in data:
+        grid += b'.' + row.encode('ascii') + b'.'
+    grid += b'.' * width
+
+    offsets = [d.value[0] * width + d.value[1] for d in _directions]
+
+    start = grid.find(ord(start_char))
+    if start == -1:
+        raise ValueError(f'Start {start_char!r} not found')
+    # First direction in which the neighbouring pipe is connected to the start
+    first_move = next((index for index, offset in enumerate(offsets)
+                       if _transitions[grid[start + offset]][index] is not None), None)
+    if first_move is None:
+        raise ValueError('No pipe is connected to the start')
+
+    mask = bytearray(len(grid))
+    position = start
+    move = first_move
+    loop_len = 0
+    while True:
+        position += offsets[move]
+        mask[position] = 1
+        loop_len += 1
+        if position == start:
+            break
+        next_move = _transitions[grid[position]][move]
+        if next_move is None:
+            raise ValueError(f'Pipe loop is broken at row {position // width - 1}, column {position % width - 1}')
+        move = next_move
+
+    # Start connects the direction we left it in and the one we came back from
+    start_directions = {_directions[first_move], _directions[move].opposite}
+    start_pipe = next(pipe for pipe, connections in pipe_connections.items() if connections == start_directions)
+    return mask, loop_len, start_pipe
+
+
+def loop_positions(data: list[str], mask: bytearray) -> set[Position]:
+    """Positions of loop cells marked in the mask returned by trace_loop."""
+    width = len(data[0]) + 2
+    return {Position(index // width - 1, index % width - 1) for index, is_loop in enumerate(mask) if is_loop}
+
+
 def process_line(line: list[str], row_index: int, pipe_positions: set[Position]) -> int:
     """
     Each occurrence of SOUTH direction 'opens' or 'closes' intervals which means 'inside' or 'outside' pipe loop.
@@ -158,12 +236,12 @@ if __name__ == '__main__':
     path = 'input.txt'
 
     data = read(path)
-    data = [list(l) for l in data]
 
     # Part 1
-    pipe_dists = find_pipe_pos_with_dists(data)
-    print(max(pipe_dists.values()))
+    mask, loop_len, start_pipe = trace_loop(data)
+    print(loop_len // 2)
 
     # Part 2
-    pipe_positions = set(pipe_dists.keys())
+    pipe_positions = loop_positions(data, mask)
+    data = [list(l.replace('S', start_pipe)) for l in data]
     print(find_area(data, pipe_positions))